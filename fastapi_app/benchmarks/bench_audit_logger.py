@@ -0,0 +1,85 @@
+"""Latency added to the request path by AuditLogger.log() at increasing request rates, with the
+background writer flushing to gzip JSONL, plus how many records were written vs dropped by sampling.
+
+Run from the fastapi_app directory:
+    python benchmarks/bench_audit_logger.py
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.AuditLogger import AuditLogger
+
+
+def make_record(i: int):
+    """A record shaped like QAPipeline._build_audit_record."""
+    return {
+        "timestamp": "2024-01-01T00:00:00+00:00",
+        "question": "How can we support indigenous sustainability in engineering projects? " * 2,
+        "response_type": "recommendation",
+        "content_type_filter": None,
+        "index_name": "emgt605_v4",
+        "faq_hit": False,
+        "input_allowed": True,
+        "retrieved_pks": [f"pk-{i}-{j}" for j in range(5)],
+        "timings": {"guardrail": 0.4, "retrieve": 0.6, "generate": 3.1, "format_answer": 0.002, "total": 4.1},
+        "token_usage": {"guardrail": {"input_tokens": 180, "output_tokens": 1, "total_tokens": 181},
+                        "generate": {"input_tokens": 2400, "output_tokens": 350, "total_tokens": 2750}},
+        "citation": {k: {"url": f"https://example.com/{k}", "title": f"Source {k}", "content_type": "html_content"} for k in range(1, 6)},
+        "error": None,
+    }
+
+def drive(audit_logger: AuditLogger, rps: int, duration: float, threads: int):
+    """Call log() from several request threads at a fixed total rate and collect the per-call latency."""
+    latencies = [[] for _ in range(threads)]
+    interval = threads / rps
+
+    def worker(t: int):
+        next_time = time.perf_counter()
+        end = next_time + duration
+        i = 0
+        while next_time < end:
+            now = time.perf_counter()
+            if now < next_time:
+                time.sleep(next_time - now)
+            record = make_record(i)
+            start = time.perf_counter()
+            audit_logger.log(record)
+            latencies[t].append(time.perf_counter() - start)
+            next_time += interval
+            i += 1
+
+    workers = [threading.Thread(target=worker, args=(t,)) for t in range(threads)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    return sorted(latency for per_thread in latencies for latency in per_thread)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rps", type=int, nargs="+", default=[100, 1000, 5000, 20000])
+    parser.add_argument("--duration", type=float, default=3.0)
+    parser.add_argument("--threads", type=int, default=8)
+    args = parser.parse_args()
+
+    for rps in args.rps:
+        log_dir = tempfile.mkdtemp(prefix="audit-bench-")
+        audit_logger = AuditLogger(log_dir)
+        audit_logger.start()
+        latencies = drive(audit_logger, rps, args.duration, args.threads)
+        audit_logger.stop(timeout=30)
+        pct = lambda p: latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1e6
+        print(f"{rps:>6} rps: {len(latencies)} calls, log() p50 {pct(0.5):.1f} us, p99 {pct(0.99):.1f} us, "
+            f"max {latencies[-1] * 1e6:.0f} us; written {audit_logger.written}, dropped {audit_logger.dropped}")
+        shutil.rmtree(log_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
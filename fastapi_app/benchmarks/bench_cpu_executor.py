@@ -0,0 +1,217 @@
+"""CPUExecutor on large synthetic transcripts, to pick CPU_EXECUTOR_SIZE_THRESHOLD.
+
+1. Per stage and input size: CPU time of running the stage inline vs the CPU the serving process still
+   spends when the stage is offloaded (pickling and IPC), plus the wall time of the pooled call.
+   Offloading pays off once the pooled call costs the serving process clearly less CPU than running inline.
+2. Under load: event-loop lag and throughput of simulated uvicorn workers (one process per WEB_CONCURRENCY)
+   serving requests from the thread pool like the sync /ask endpoint, with the CPU stages inline vs offloaded.
+   Each worker sizes its pool with initialize_cpu_executor, unless --pool-workers is given.
+
+Run from the fastapi_app directory:
+    python benchmarks/bench_cpu_executor.py
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.CitationFormatter import CitationFormatter
+from utils.CPUExecutor import CPUExecutor
+from utils.DocumentCache import ParsedIndexMetadata
+from utils.MMRFilter import MMRFilter
+from utils.SourceFormatter import SourceFormatter
+
+BLOCK_CHARS = 200
+EMBEDDING_DIM = 3072
+
+
+def make_index_metadata(num_blocks: int) -> str:
+    return json.dumps([{"start_time": i * 15, "char_start": i * BLOCK_CHARS} for i in range(num_blocks)])
+
+def make_sources(num_chunks: int, chunk_chars: int):
+    """Transcript hits shaped like AzureVectorSearch results, with the index_metadata already parsed."""
+    words = "the lifecycle of carbon in the energy system and the design of waste policy ".split()
+    text = " ".join(words[i % len(words)] for i in range(chunk_chars // 6))[:chunk_chars]
+    index_metadata = ParsedIndexMetadata.from_json(make_index_metadata(chunk_chars // BLOCK_CHARS + 1))
+    return [{
+        "pk": f"chunk-{chunk}",
+        "text": text,
+        "index_metadata": index_metadata,
+        "metadata": {
+            "start_index": 0,
+            "video_url": f"https://example.com/video/{chunk}",
+            "video_title": f"Lecture {chunk}",
+            "contextual_header": "header",
+            "content_type": "video_transcript",
+        },
+    } for chunk in range(num_chunks)]
+
+def copy_sources(sources):
+    # format_sources_for_llm mutates the sources, and the search returns fresh dicts on every request
+    return [{**s, "metadata": dict(s["metadata"])} for s in sources]
+
+def make_answer(formatted_sources) -> str:
+    """An answer citing every fourth split, like the LLM output format_final_answer expects."""
+    source_ids = [i for source in formatted_sources["source_dicts"] for i in source["source_ids"]]
+    return " ".join(f"Point {n} [{i}]." for n, i in enumerate(source_ids[::4]))
+
+
+class Request:
+    """The CPU stages of one request: MMR selection, source formatting and citation formatting."""
+    def __init__(self, num_chunks: int, chunk_chars: int, pool_size: int, seed: int = 0):
+        rng = np.random.default_rng(seed)
+        self.sources = make_sources(num_chunks, chunk_chars)
+        self.query = rng.normal(size=EMBEDDING_DIM).astype(np.float32)
+        self.candidate_vectors = rng.normal(size=(pool_size, EMBEDDING_DIM)).astype(np.float32)
+        self.answer = make_answer(SourceFormatter().format_sources_for_llm(copy_sources(self.sources)))
+        self.mmr_filter = MMRFilter(candidate_pool_size=pool_size)
+        self.source_formatter = SourceFormatter()
+        self.citation_formatter = CitationFormatter()
+
+    def __call__(self, cpu_executor: CPUExecutor):
+        # MMR runs inline as in AzureVectorSearch.hybrid_search, and the sizes are passed as in QAPipeline
+        self.mmr_filter.select(self.query, self.candidate_vectors, k=len(self.sources))
+        sources = copy_sources(self.sources)
+        formatted_sources = cpu_executor.run(self.source_formatter.format_sources_for_llm, sources,
+                                            size=sum(len(source["text"]) for source in sources))
+        return cpu_executor.run(self.citation_formatter.format_final_answer, self.answer, formatted_sources["source_dicts"],
+                                size=len(self.answer) + len(formatted_sources["content"]))
+
+
+def time_call(fn, repeats: int):
+    """Mean CPU time of this process (all threads) and wall time per call."""
+    fn()
+    cpu_start, wall_start = time.process_time(), time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return (time.process_time() - cpu_start) / repeats, (time.perf_counter() - wall_start) / repeats
+
+def bench_stages(args):
+    inline = CPUExecutor(max_workers=0)
+    pooled = CPUExecutor(max_workers=1, size_threshold=0)
+    rows = []
+
+    for num_blocks in args.blocks:
+        raw = make_index_metadata(num_blocks)
+        rows.append(("decode index_metadata", f"{num_blocks} blocks", len(raw), "chars",
+            lambda executor, raw=raw: executor.run(ParsedIndexMetadata.from_json, raw, size=len(raw))))
+    for chunk_chars in args.chunk_chars:
+        request = Request(args.chunks, chunk_chars, args.pool_size)
+        sources = request.sources
+        size = sum(len(source["text"]) for source in sources)
+        rows.append(("format_sources_for_llm", f"{args.chunks} x {chunk_chars} chars", size, "chars",
+            lambda executor, request=request: executor.run(request.source_formatter.format_sources_for_llm,
+                                                            copy_sources(request.sources), size=0)))
+        formatted_sources = request.source_formatter.format_sources_for_llm(copy_sources(sources))
+        size = len(request.answer) + len(formatted_sources["content"])
+        rows.append(("format_final_answer", f"{args.chunks} x {chunk_chars} chars", size, "chars",
+            lambda executor, request=request, source_dicts=formatted_sources["source_dicts"]: executor.run(
+                request.citation_formatter.format_final_answer, request.answer, source_dicts, size=0)))
+    for pool_size in args.mmr_pool_sizes:
+        request = Request(args.chunks, 1000, pool_size)
+        # Kept to show why MMR runs inline: the pooled call costs more than the scoring at every pool size
+        rows.append(("MMR select", f"{pool_size} x {EMBEDDING_DIM} float32", request.candidate_vectors.nbytes, "bytes",
+            lambda executor, request=request: executor.run(request.mmr_filter.select, request.query,
+                                                            request.candidate_vectors, size=0, k=args.chunks)))
+
+    print(f"{'stage':<24}{'input':<24}{'size':>12}  {'inline CPU':>11}  {'pooled CPU':>11}  {'pooled wall':>11}")
+    for stage, label, size, unit, fn in rows:
+        inline_cpu, _ = time_call(lambda: fn(inline), args.repeats)
+        pooled_cpu, pooled_wall = time_call(lambda: fn(pooled), args.repeats)
+        print(f"{stage:<24}{label:<24}{size:>8} {unit:<5}  {inline_cpu * 1000:>8.2f} ms  {pooled_cpu * 1000:>8.2f} ms  "
+            f"{pooled_wall * 1000:>8.2f} ms")
+    pooled.shutdown()
+
+
+def serve(web_concurrency: int, pool_workers, size_threshold: int, args, results) -> None:
+    """One simulated uvicorn worker: an event loop with a lag probe, and clients whose requests run in the
+    thread pool like a sync FastAPI endpoint."""
+    os.environ["WEB_CONCURRENCY"] = str(web_concurrency)
+    from utils.setup import initialize_cpu_executor
+    cpu_executor = initialize_cpu_executor({"CPU_EXECUTOR_WORKERS": pool_workers, "CPU_EXECUTOR_SIZE_THRESHOLD": size_threshold})
+    request = Request(args.chunks, args.load_chunk_chars, args.pool_size)
+    # Start the pool workers before measuring
+    cpu_executor.run(sum, [1], size=cpu_executor.size_threshold)
+
+    async def main():
+        loop = asyncio.get_running_loop()
+        # Starlette runs sync endpoints on a thread pool of 40 threads
+        threads = ThreadPoolExecutor(max_workers=40)
+        end = time.perf_counter() + args.duration
+        lags, completed = [], [0]
+
+        async def probe():
+            while time.perf_counter() < end:
+                start = time.perf_counter()
+                await asyncio.sleep(0.005)
+                lags.append(time.perf_counter() - start - 0.005)
+
+        async def client():
+            while time.perf_counter() < end:
+                await loop.run_in_executor(threads, request, cpu_executor)
+                completed[0] += 1
+
+        await asyncio.gather(probe(), *(client() for _ in range(args.clients)))
+        threads.shutdown()
+        return lags, completed[0]
+
+    lags, completed = asyncio.run(main())
+    cpu_executor.shutdown()
+    results.put((cpu_executor.max_workers, completed, lags))
+
+def bench_load(args, size_threshold: int):
+    context = multiprocessing.get_context("spawn")
+    print(f"\n{args.clients} concurrent clients per worker for {args.duration:.0f} s, {args.chunks} x "
+        f"{args.load_chunk_chars} chars per request, CPU_EXECUTOR_SIZE_THRESHOLD {size_threshold} on {os.cpu_count()} cores")
+    print(f"{'WEB_CONCURRENCY':<17}{'mode':<9}{'pool/worker':>12}{'req/s':>9}{'lag p50':>11}{'lag p99':>11}{'lag max':>11}")
+    for web_concurrency in args.web_concurrency:
+        for mode, pool_workers in (("inline", 0), ("pool", args.pool_workers)):
+            results = context.Queue()
+            workers = [context.Process(target=serve, args=(web_concurrency, pool_workers, size_threshold, args, results))
+                    for _ in range(web_concurrency)]
+            for w in workers:
+                w.start()
+            outputs = [results.get() for _ in workers]
+            for w in workers:
+                w.join()
+            pool_size = outputs[0][0]
+            completed = sum(output[1] for output in outputs)
+            lags = sorted(lag for output in outputs for lag in output[2])
+            pct = lambda p: lags[min(len(lags) - 1, int(p * len(lags)))] * 1000
+            print(f"{web_concurrency:<17}{mode:<9}{pool_size:>12}{completed / args.duration:>9.1f}"
+                f"{pct(0.5):>8.2f} ms{pct(0.99):>8.2f} ms{lags[-1] * 1000:>8.1f} ms")
+
+
+def main():
+    from utils.config import CPU_EXECUTOR_SIZE_THRESHOLD
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunks", type=int, default=5)
+    parser.add_argument("--pool-size", type=int, default=15, help="MMR candidate pool size")
+    parser.add_argument("--blocks", type=int, nargs="+", default=[100, 1000, 4000, 16000])
+    parser.add_argument("--chunk-chars", type=int, nargs="+", default=[1000, 4000, 16000, 64000])
+    parser.add_argument("--mmr-pool-sizes", type=int, nargs="+", default=[5, 15, 50])
+    parser.add_argument("--repeats", type=int, default=50)
+    parser.add_argument("--load-chunk-chars", type=int, default=16000)
+    parser.add_argument("--web-concurrency", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--pool-workers", type=int, default=None,
+                        help="pool size per worker; defaults to the initialize_cpu_executor formula")
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--size-threshold", type=int, default=CPU_EXECUTOR_SIZE_THRESHOLD)
+    args = parser.parse_args()
+
+    bench_stages(args)
+    bench_load(args, args.size_threshold)
+
+
+if __name__ == "__main__":
+    main()
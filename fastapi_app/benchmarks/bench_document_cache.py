@@ -0,0 +1,78 @@
+"""Per-request CPU of the retrieve stage post-processing (index_metadata decoding + format_sources_for_llm),
+decoding the raw JSON on every request (before) vs serving it from a warm DocumentCache (after).
+
+Run from the fastapi_app directory:
+    python benchmarks/bench_document_cache.py
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.DocumentCache import DocumentCache, ParsedIndexMetadata
+from utils.SourceFormatter import SourceFormatter
+
+
+def make_search_results(num_chunks: int, blocks_per_chunk: int, chunk_chars: int):
+    """Synthetic transcript hits shaped like AzureVectorSearch results, with index_metadata still as raw JSON."""
+    results = []
+    for chunk in range(num_chunks):
+        blocks = [{"start_time": i * 15, "char_start": i * 200} for i in range(blocks_per_chunk)]
+        results.append({
+            "pk": f"chunk-{chunk}",
+            "text": "lorem ipsum " * (chunk_chars // 12),
+            "index_metadata": json.dumps(blocks),
+            "metadata": {
+                "start_index": (blocks_per_chunk // 2) * 200,
+                "video_url": f"https://example.com/video/{chunk}",
+                "video_title": f"Lecture {chunk}",
+                "contextual_header": "header",
+                "content_type": "video_transcript",
+            },
+        })
+    return results
+
+def run_request(raw_results, source_formatter: SourceFormatter, document_cache=None):
+    # The search results are fresh dicts on every request
+    sources = []
+    for r in raw_results:
+        r = {**r, "metadata": dict(r["metadata"])}
+        if document_cache is None:
+            r["index_metadata"] = ParsedIndexMetadata.from_json(r["index_metadata"])
+        else:
+            r["index_metadata"] = document_cache.get_or_parse(r["pk"], r["index_metadata"])
+        sources.append(r)
+    return source_formatter.format_sources_for_llm(sources)
+
+def bench(raw_results, requests: int, document_cache=None) -> float:
+    source_formatter = SourceFormatter()
+    if document_cache is not None:
+        run_request(raw_results, source_formatter, document_cache)
+    start = time.process_time()
+    for _ in range(requests):
+        run_request(raw_results, source_formatter, document_cache)
+    return (time.process_time() - start) / requests
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--chunks", type=int, default=5)
+    parser.add_argument("--blocks", type=int, default=2000)
+    parser.add_argument("--chunk-chars", type=int, default=1000)
+    args = parser.parse_args()
+
+    raw_results = make_search_results(args.chunks, args.blocks, args.chunk_chars)
+    cold = bench(raw_results, args.requests)
+    document_cache = DocumentCache()
+    warm = bench(raw_results, args.requests, document_cache)
+    print(f"{args.chunks} chunks x {args.blocks} blocks, {args.requests} requests")
+    print(f"decode every request (before): {cold * 1000:.3f} ms CPU/request")
+    print(f"warm DocumentCache (after):    {warm * 1000:.3f} ms CPU/request ({cold / warm:.1f}x)")
+    print(f"cache: {document_cache.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""Prompt size and retrieve cost of plain top-k vs MMR + near-duplicate filtering on a synthetic,
+duplicate-heavy corpus (each distinct chunk appears several times, e.g. repeated lecture recordings
+under different URLs, which _merge_overlapping_sources cannot merge).
+
+The retrieve cost covers what MMR adds in the serving process: the larger search response with the
+dense_vector of every candidate (payload size and JSON decoding), building the candidate matrix and
+select(). It is a lower bound, since the Azure SDK does more work per hit than json.loads, and the
+network transfer of the extra payload is not included.
+
+Run from the fastapi_app directory:
+    python benchmarks/bench_mmr.py
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.DocumentCache import ParsedIndexMetadata
+from utils.MMRFilter import MMRFilter
+from utils.SourceFormatter import SourceFormatter
+
+
+def load_token_counter():
+    """Count gpt-4o tokens with tiktoken if its encoding is available, otherwise estimate with chars / 4."""
+    try:
+        import tiktoken
+        encoding = tiktoken.get_encoding("o200k_base")
+        return lambda text: len(encoding.encode(text)), "o200k_base tokens"
+    except Exception:
+        return lambda text: len(text) // 4, "estimated tokens (chars / 4)"
+
+def make_candidates(rng, num_distinct: int, copies: int, dim: int, noise: float, chunk_words: int):
+    """Candidates ranked by relevance, where every distinct chunk has near-duplicate copies."""
+    base = rng.normal(size=(num_distinct, dim)).astype(np.float32)
+    query = base[: num_distinct // 2].mean(axis=0) + 0.5 * rng.normal(size=dim).astype(np.float32)
+    vectors, sources = [], []
+    words = np.array(["carbon", "energy", "lifecycle", "water", "waste", "design", "policy", "system"])
+    for copy in range(copies):
+        for chunk in range(num_distinct):
+            vectors.append(base[chunk] + noise * rng.normal(size=dim).astype(np.float32))
+            text = " ".join(words[(np.arange(chunk_words) * (chunk + 3)) % len(words)])
+            blocks = [{"start_time": i * 15, "char_start": i * 200} for i in range(len(text) // 200 + 1)]
+            sources.append({
+                "pk": f"{chunk}-{copy}",
+                "text": text,
+                "index_metadata": ParsedIndexMetadata.from_json(json.dumps(blocks)),
+                "metadata": {
+                    "start_index": 0,
+                    # A re-recorded lecture has the same content under a different URL
+                    "video_url": f"https://example.com/video/{chunk}/recording/{copy}",
+                    "video_title": f"Lecture {chunk}",
+                    "contextual_header": "header",
+                    "content_type": "video_transcript",
+                },
+            })
+    vectors = np.asarray(vectors)
+    relevance = vectors @ query / (np.linalg.norm(vectors, axis=1) * np.linalg.norm(query))
+    order = np.argsort(-relevance)
+    return query, vectors[order], [sources[i] for i in order], relevance[order]
+
+def search_response(sources, vectors, relevance, with_vectors: bool) -> str:
+    """A search response body shaped like Azure Search's, with the embeddings serialized as float32 values."""
+    hits = []
+    for source, vector, score in zip(sources, vectors, relevance):
+        hit = {"@search.score": 0.03, "@search.reranker_score": float(score) * 4, "pk": source["pk"], "text": source["text"],
+            "index_metadata": "[]", "metadata": source["metadata"]}
+        if with_vectors:
+            # Azure Search returns normalized text-embedding-3-large vectors with float32 precision
+            hit["dense_vector"] = [float(f"{v:.8g}") for v in vector / np.linalg.norm(vector)]
+        hits.append(hit)
+    return json.dumps({"value": hits})
+
+def time_retrieve(response: str, query, mmr_filter, top_k: int, repeats: int) -> float:
+    """CPU time per request of decoding the response and, with an MMR filter, selecting from the vectors."""
+    start = time.process_time()
+    for _ in range(repeats):
+        hits = json.loads(response)["value"]
+        if mmr_filter is not None:
+            candidate_vectors = np.asarray([hit["dense_vector"] for hit in hits], dtype=np.float32)
+            relevance = [hit["@search.reranker_score"] / 4 for hit in hits]
+            mmr_filter.select(query, candidate_vectors, top_k, relevance=relevance)
+    return (time.process_time() - start) / repeats
+
+def prompt_size(sources, count_tokens) -> int:
+    # format_sources_for_llm mutates the sources, so format copies
+    copies = [{**s, "metadata": dict(s["metadata"])} for s in sources]
+    return count_tokens(SourceFormatter().format_sources_for_llm(copies)["content"])
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--distinct", type=int, default=8)
+    parser.add_argument("--copies", type=int, default=3)
+    parser.add_argument("--dim", type=int, default=3072)
+    parser.add_argument("--noise", type=float, default=0.05)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--pool-sizes", type=int, nargs="+", default=[5, 10, 15, 30, 50])
+    parser.add_argument("--lambdas", type=float, nargs="+", default=[0.5, 0.7, 0.9])
+    parser.add_argument("--repeats", type=int, default=50)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    count_tokens, token_unit = load_token_counter()
+    query, vectors, sources, relevance = make_candidates(rng, args.distinct, args.copies, args.dim, args.noise, chunk_words=150)
+
+    def describe(selected):
+        """Prompt tokens, number of distinct chunks and tokens spent on chunks already in the prompt."""
+        seen, duplicate_tokens = set(), 0
+        for i in selected:
+            chunk = sources[i]["pk"].split("-")[0]
+            if chunk in seen:
+                duplicate_tokens += prompt_size([sources[i]], count_tokens)
+            seen.add(chunk)
+        return prompt_size([sources[i] for i in selected], count_tokens), len(seen), duplicate_tokens
+
+    plain = list(range(args.top_k))
+    plain_tokens, plain_distinct, plain_duplicate = describe(plain)
+    print(f"corpus: {args.distinct} distinct chunks x {args.copies} copies, dim {args.dim}; prompt size in {token_unit}")
+    print(f"plain top-{args.top_k}: {plain_tokens} tokens, {plain_distinct} distinct chunks, {plain_duplicate} duplicate tokens")
+    for pool_size in args.pool_sizes:
+        for lambda_mult in args.lambdas:
+            mmr_filter = MMRFilter(lambda_mult=lambda_mult, candidate_pool_size=pool_size)
+            selected = mmr_filter.select(query, vectors[:pool_size], args.top_k, relevance=relevance[:pool_size])
+            tokens, num_distinct, duplicate = describe(selected)
+            # Same distinct coverage as plain top-k: keep only as many MMR hits as plain had distinct chunks
+            same_coverage_tokens, _, _ = describe(selected[:plain_distinct])
+            print(f"MMR pool={pool_size:<3} lambda={lambda_mult}: {tokens} tokens, {num_distinct} distinct chunks, "
+                f"{duplicate} duplicate tokens; at plain's coverage {same_coverage_tokens} tokens "
+                f"({(same_coverage_tokens / plain_tokens - 1) * 100:.0f}%)")
+
+    print("\nretrieve cost per request in the serving process (response decoding, candidate matrix, select)")
+    plain_response = search_response(sources[:args.top_k], vectors, relevance, with_vectors=False)
+    plain_ms = time_retrieve(plain_response, query, None, args.top_k, args.repeats) * 1000
+    print(f"plain top-{args.top_k}: response {len(plain_response) / 1024:.0f} KB, {plain_ms:.2f} ms CPU")
+    for pool_size in sorted({min(pool_size, len(sources)) for pool_size in args.pool_sizes}):
+        mmr_filter = MMRFilter(candidate_pool_size=pool_size)
+        response = search_response(sources[:pool_size], vectors, relevance, with_vectors=True)
+        mmr_ms = time_retrieve(response, query, mmr_filter, args.top_k, args.repeats) * 1000
+        start = time.process_time()
+        for _ in range(args.repeats):
+            mmr_filter.select(query, vectors[:pool_size], args.top_k, relevance=relevance[:pool_size])
+        select_ms = (time.process_time() - start) / args.repeats * 1000
+        print(f"MMR pool={pool_size:<3}: response {len(response) / 1024:.0f} KB (+{(len(response) - len(plain_response)) / 1024:.0f} KB), "
+            f"{mmr_ms:.2f} ms CPU (+{mmr_ms - plain_ms:.2f} ms, of which select {select_ms:.2f} ms)")
+
+if __name__ == "__main__":
+    main()
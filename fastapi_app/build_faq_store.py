@@ -0,0 +1,47 @@
+import argparse
+import logging
+
+from utils.FAQStore import FAQStore
+from utils.IndexSnapshot import current_snapshot
+from utils.QAPipeline import QAPipeline
+from utils.setup import (
+    initialize_llm,
+    initialize_vector_search,
+    load_config,
+    load_env_vars,
+)
+
+RESPONSE_TYPES = ["answer", "recommendation"]
+CONTENT_TYPE_FILTERS = [None, "video_transcript", "html_content"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute the answers of frequent questions into the FAQ store.")
+    parser.add_argument("questions_file", help="Text file with one question per line.")
+    parser.add_argument("--output", default=None, help="Output directory of the FAQ store (defaults to FAQ_STORE_PATH in the config).")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    with open(args.questions_file, encoding="utf-8") as f:
+        questions = list(dict.fromkeys(line.strip() for line in f if line.strip()))
+
+    session_env = load_env_vars()
+    session_config = load_config()
+    # Build on the same index snapshot as the app, so the answers carry its content version
+    snapshot = current_snapshot(session_config['SNAPSHOT_DIR'])
+    if snapshot is not None:
+        session_config['AZURE_INDEX_NAME'] = snapshot['index_name']
+    llm = initialize_llm(session_env, session_config)
+    vector_search = initialize_vector_search(session_env, session_config)
+    # The pipeline used for building must not have a FAQ store, otherwise it would answer from the old store
+    qa_pipeline = QAPipeline(llm, vector_search, course_name=session_config['COURSE_NAME'],
+                            index_version=snapshot.get('content_version') if snapshot else None)
+
+    faq_store = FAQStore.build(qa_pipeline, questions, RESPONSE_TYPES, CONTENT_TYPE_FILTERS)
+    output = args.output or session_config['FAQ_STORE_PATH']
+    faq_store.save(output)
+    print(f"Saved {len(faq_store)} answers of {len(questions)} questions to {output} ({faq_store.skipped} entries skipped due to errors)")
+
+
+if __name__ == "__main__":
+    main()
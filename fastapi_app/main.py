@@ -1,3 +1,5 @@
+import asyncio
+import logging
 import os
 from contextlib import asynccontextmanager
 from typing import Dict, Optional
@@ -5,14 +7,50 @@ from typing import Dict, Optional
 from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
 
+from utils.IndexSnapshot import apply_delta, current_snapshot
 from utils.QAPipeline import QAPipeline
 from utils.setup import (
+    initialize_audit_logger,
+    initialize_cpu_executor,
+    initialize_faq_store,
     initialize_llm,
     initialize_vector_search,
     load_config,
     load_env_vars,
 )
 
+logger = logging.getLogger(__name__)
+
+
+async def watch_index_snapshot(app: FastAPI, session_env: Dict, session_config: Dict, llm, faq_store, audit_logger, cpu_executor):
+    """Swap in a QA pipeline on the index snapshot marked as current by sync_index.py.
+    In-flight requests keep their reference to the old pipeline, so they finish on the old index.
+    The snapshot generation is compared rather than the index name, so re-syncing the same index is picked up too.
+    """
+    snapshot_dir = session_config['SNAPSHOT_DIR']
+    while True:
+        await asyncio.sleep(session_config['SNAPSHOT_POLL_INTERVAL'])
+        snapshot = current_snapshot(snapshot_dir)
+        if snapshot is None or snapshot['generation'] == app.state.snapshot_generation:
+            continue
+        index_name = snapshot['index_name']
+        old_vector_search = app.state.qa_pipeline.vector_search
+        try:
+            # Only the documents changed since the running snapshot are re-parsed into the new cache
+            document_cache = await asyncio.to_thread(apply_delta, old_vector_search.document_cache, snapshot_dir,
+                                                    snapshot['generation'], app.state.snapshot_generation)
+            vector_search = initialize_vector_search(session_env, {**session_config, 'AZURE_INDEX_NAME': index_name}, document_cache,
+                                                    cpu_executor=cpu_executor)
+            qa_pipeline = QAPipeline(llm, vector_search, course_name=session_config['COURSE_NAME'],
+                                    faq_store=faq_store, faq_match_threshold=session_config['FAQ_MATCH_THRESHOLD'],
+                                    audit_logger=audit_logger, cpu_executor=cpu_executor,
+                                    index_version=snapshot.get('content_version'))
+        except Exception:
+            logger.exception(f"Failed to switch to the index snapshot {snapshot['generation']}, keeping {app.state.snapshot_generation}")
+            continue
+        app.state.qa_pipeline = qa_pipeline
+        logger.info(f"Switched from the index snapshot {app.state.snapshot_generation} to {snapshot['generation']}")
+        app.state.snapshot_generation = snapshot['generation']
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -22,11 +60,28 @@ async def lifespan(app: FastAPI):
     
     session_env = load_env_vars()
     session_config = load_config()
+    # The latest synced index snapshot takes precedence over the configured index
+    snapshot = current_snapshot(session_config['SNAPSHOT_DIR'])
+    if snapshot is not None:
+        session_config['AZURE_INDEX_NAME'] = snapshot['index_name']
+    app.state.snapshot_generation = snapshot['generation'] if snapshot else None
     llm = initialize_llm(session_env, session_config)
-    vector_search = initialize_vector_search(session_env, session_config)
+    cpu_executor = initialize_cpu_executor(session_config)
+    vector_search = initialize_vector_search(session_env, session_config, cpu_executor=cpu_executor)
     app.state.course_name = session_config['COURSE_NAME']
-    app.state.qa_pipeline = QAPipeline(llm, vector_search, course_name=session_config['COURSE_NAME'])
+    faq_store = initialize_faq_store(session_config)
+    audit_logger = initialize_audit_logger(session_config)
+    audit_logger.start()
+    app.state.qa_pipeline = QAPipeline(llm, vector_search, course_name=session_config['COURSE_NAME'],
+                                    faq_store=faq_store, faq_match_threshold=session_config['FAQ_MATCH_THRESHOLD'],
+                                    audit_logger=audit_logger, cpu_executor=cpu_executor,
+                                    index_version=snapshot.get('content_version') if snapshot else None)
+    watcher = asyncio.create_task(watch_index_snapshot(app, session_env, session_config, llm, faq_store, audit_logger, cpu_executor))
     yield
+    watcher.cancel()
+    # Flush the queued audit records before shutting down
+    audit_logger.stop()
+    cpu_executor.shutdown()
 
 app = FastAPI(lifespan=lifespan)
 
@@ -52,13 +107,17 @@ Ask me anything related to the course, and I will try to answer based on the cou
 
 @app.post("/ask", response_model=Response, summary="Ask questions related to the course content.", 
         description="Submit a question to the QA pipeline and retrieve an answer or recommendation with citations of relevant course content.")
-async def ask_question(request: QueryRequest):
+def ask_question(request: QueryRequest):
+    # A sync endpoint runs in the threadpool, so the blocking LLM and search calls do not stall the event loop.
+    # The CPU-heavy stages are offloaded to the process pool of the CPUExecutor.
     query = request.query
     response_type = request.response_type
     content_type_filter = request.content_type_filter
     
+    # Hold the pipeline for the whole request, as it may be swapped by watch_index_snapshot
+    qa_pipeline = app.state.qa_pipeline
     try:
-        response = app.state.qa_pipeline.run(query=query, response_type=response_type, content_type_filter=content_type_filter)
+        response = qa_pipeline.run(query=query, response_type=response_type, content_type_filter=content_type_filter)
         answer = response["content"]
         citations = response["citation"]
         return Response(answer=answer, citations=citations)
@@ -0,0 +1,27 @@
+import argparse
+
+from utils.IndexSnapshot import AzureIndexExportSource, FileExportSource, sync_snapshot
+from utils.setup import load_config, load_env_vars
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sync an index export into the local snapshot and mark it as current for the running app.")
+    parser.add_argument("index_name", help="Name of the new index version, e.g. emgt605_v5.")
+    parser.add_argument("--export-file", default=None, help="Sync from a local JSONL export instead of the Azure Search index.")
+    args = parser.parse_args()
+
+    session_config = load_config()
+    if args.export_file:
+        source = FileExportSource(args.export_file)
+    else:
+        session_env = load_env_vars()
+        source = AzureIndexExportSource(session_env["AZURE_SEARCH_ENDPOINT"], session_env["AZURE_SEARCH_KEY"], args.index_name,
+                                        session_config['OUTPUT_FIELDS'], page_size=session_config['EXPORT_PAGE_SIZE'])
+
+    delta = sync_snapshot(source, session_config['SNAPSHOT_DIR'], args.index_name)
+    print(f"Synced {args.index_name} against {delta['base_generation']}: "
+        f"{len(delta['changed'])} changed, {len(delta['removed'])} removed documents")
+
+
+if __name__ == "__main__":
+    main()
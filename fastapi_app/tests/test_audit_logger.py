@@ -0,0 +1,52 @@
+import glob
+import gzip
+import json
+import os
+
+from utils.AuditLogger import AuditLogger
+
+
+def read_records(log_dir):
+    records = []
+    for path in glob.glob(os.path.join(log_dir, "audit-*.jsonl.gz")):
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            records.extend(json.loads(line) for line in f)
+    return sorted(records, key=lambda record: record["i"])
+
+def log_records(audit_logger, ids):
+    audit_logger.start()
+    for i in ids:
+        assert audit_logger.log({"i": i})
+    audit_logger.stop()
+
+
+def test_records_are_written(tmp_path):
+    audit_logger = AuditLogger(str(tmp_path), flush_interval=0.05)
+    log_records(audit_logger, range(10))
+    assert [record["i"] for record in read_records(str(tmp_path))] == list(range(10))
+    assert (audit_logger.written, audit_logger.dropped) == (10, 0)
+
+def test_removed_current_file_starts_a_new_file(tmp_path):
+    audit_logger = AuditLogger(str(tmp_path), flush_interval=0.05)
+    log_records(audit_logger, [0])
+    # E.g. pruned by the rotation of another worker sharing the directory
+    for path in glob.glob(os.path.join(str(tmp_path), "audit-*.jsonl.gz")):
+        os.remove(path)
+    log_records(audit_logger, range(1, 6))
+    assert [record["i"] for record in read_records(str(tmp_path))] == list(range(1, 6))
+    assert (audit_logger.written, audit_logger.dropped) == (6, 0)
+
+def test_rotation_keeps_max_files(tmp_path):
+    # Every batch fills a file, so each batch rotates to a new one
+    audit_logger = AuditLogger(str(tmp_path), max_file_bytes=1, max_files=3)
+    for i in range(6):
+        audit_logger._write_batch([{"i": i}])
+    assert len(glob.glob(os.path.join(str(tmp_path), "audit-*.jsonl.gz"))) == 3
+    assert [record["i"] for record in read_records(str(tmp_path))] == [3, 4, 5]
+
+def test_overload_sampling(tmp_path):
+    # Not started, so the queue fills up; above the watermark nothing is sampled with a rate of 0
+    audit_logger = AuditLogger(str(tmp_path), queue_size=10, high_watermark=0.5, overload_sample_rate=0)
+    accepted = sum(audit_logger.log({"i": i}) for i in range(20))
+    assert accepted == 5
+    assert audit_logger.dropped == 15
@@ -0,0 +1,55 @@
+import multiprocessing
+import os
+
+from utils.CPUExecutor import CPUExecutor
+from utils.DocumentCache import ParsedIndexMetadata
+from utils.SourceFormatter import SourceFormatter
+
+
+def exit_in_pool_worker(value):
+    """Simulate a pool worker killed while running the call (e.g. out of memory)."""
+    if multiprocessing.parent_process() is not None:
+        os._exit(1)
+    return value
+
+def make_sources():
+    return [{
+        "pk": f"chunk-{chunk}",
+        "text": "lorem ipsum dolor sit amet " * 40,
+        "index_metadata": ParsedIndexMetadata.from_json('[{"start_time": 0, "char_start": 0}, {"start_time": 15, "char_start": 500}]'),
+        "metadata": {"start_index": 0, "video_url": f"https://example.com/video/{chunk}", "video_title": f"Lecture {chunk}",
+                    "contextual_header": "header", "content_type": "video_transcript"},
+    } for chunk in range(3)]
+
+
+def test_pooled_run_matches_inline():
+    source_formatter = SourceFormatter()
+    inline = CPUExecutor(max_workers=0).run(source_formatter.format_sources_for_llm, make_sources(), size=0)
+    cpu_executor = CPUExecutor(max_workers=1, size_threshold=0)
+    try:
+        pooled = cpu_executor.run(source_formatter.format_sources_for_llm, make_sources(), size=0)
+    finally:
+        cpu_executor.shutdown()
+    assert pooled == inline
+
+def test_below_threshold_runs_inline():
+    cpu_executor = CPUExecutor(max_workers=1, size_threshold=100)
+    try:
+        # Would exit the pool worker if it ran there
+        assert cpu_executor.run(exit_in_pool_worker, 1, size=99) == 1
+        assert cpu_executor.run(os.getpid, size=99) == os.getpid()
+        assert cpu_executor.run(os.getpid, size=100) != os.getpid()
+    finally:
+        cpu_executor.shutdown()
+
+def test_broken_pool_is_replaced():
+    cpu_executor = CPUExecutor(max_workers=1, size_threshold=0)
+    try:
+        broken = cpu_executor._pool
+        # The call falls back to running inline once the worker died
+        assert cpu_executor.run(exit_in_pool_worker, 42, size=1) == 42
+        assert cpu_executor._pool is not broken
+        # Later calls run in the new pool again
+        assert cpu_executor.run(os.getpid, size=1) != os.getpid()
+    finally:
+        cpu_executor.shutdown()
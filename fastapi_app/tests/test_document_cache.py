@@ -0,0 +1,62 @@
+import json
+
+from utils.DocumentCache import DocumentCache, ParsedIndexMetadata
+
+
+def make_raw(num_blocks: int) -> str:
+    return json.dumps([{"start_time": i * 15, "char_start": i * 200} for i in range(num_blocks)])
+
+def entry_bytes(pk: str, num_blocks: int) -> int:
+    return DocumentCache._entry_bytes(pk, ParsedIndexMetadata.from_json(make_raw(num_blocks)))
+
+
+def test_parsed_index_metadata():
+    parsed = ParsedIndexMetadata.from_json(make_raw(3))
+    assert list(parsed.char_starts) == [0, 200, 400]
+    assert parsed.block_ids == {"start_time": (0, 15, 30)}
+    assert len(parsed) == 3
+
+def test_get_or_parse_counts_hits_and_misses():
+    document_cache = DocumentCache()
+    first = document_cache.get_or_parse("a", make_raw(3))
+    assert document_cache.get_or_parse("a", "not decoded on a hit") is first
+    stats = document_cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 1, 1)
+    assert stats["current_bytes"] == entry_bytes("a", 3)
+
+def test_lru_eviction_within_byte_budget():
+    # Room for two entries of the same size but not three
+    document_cache = DocumentCache(max_bytes=int(entry_bytes("a", 10) * 2.5))
+    for pk in ("a", "b"):
+        document_cache.get_or_parse(pk, make_raw(10))
+    # Touch a so that b is the least recently used
+    document_cache.get("a")
+    document_cache.get_or_parse("c", make_raw(10))
+
+    assert "a" in document_cache and "c" in document_cache
+    assert "b" not in document_cache
+    stats = document_cache.stats()
+    assert stats["evictions"] == 1
+    assert stats["current_bytes"] == entry_bytes("a", 10) + entry_bytes("c", 10) <= stats["max_bytes"]
+
+def test_entry_over_budget_is_not_cached():
+    document_cache = DocumentCache(max_bytes=entry_bytes("a", 10) - 1)
+    parsed = document_cache.get_or_parse("a", make_raw(10))
+    assert list(parsed.char_starts)[:2] == [0, 200]
+    assert len(document_cache) == 0 and document_cache.current_bytes == 0
+
+def test_put_replaces_entry_bytes():
+    document_cache = DocumentCache()
+    document_cache.put("a", ParsedIndexMetadata.from_json(make_raw(100)))
+    document_cache.put("a", ParsedIndexMetadata.from_json(make_raw(1)))
+    assert document_cache.current_bytes == entry_bytes("a", 1)
+
+def test_copy_excludes_pks_and_keeps_budget():
+    document_cache = DocumentCache(max_bytes=10 * 1024 * 1024)
+    for pk in ("a", "b", "c"):
+        document_cache.get_or_parse(pk, make_raw(5))
+    new_cache = document_cache.copy(exclude={"b"})
+    assert new_cache.max_bytes == document_cache.max_bytes
+    assert new_cache.get("a") is document_cache.get("a")
+    assert "b" not in new_cache and "b" in document_cache
+    assert new_cache.current_bytes == entry_bytes("a", 5) + entry_bytes("c", 5)
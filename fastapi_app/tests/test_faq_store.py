@@ -0,0 +1,58 @@
+from types import SimpleNamespace
+
+import numpy as np
+
+from utils.FAQStore import FAQStore
+
+QUESTIONS = ["What is a lifecycle assessment?", "How is carbon accounted?", "Which question fails?"]
+
+
+class FakeEmbeddings:
+    """One orthogonal embedding per known question."""
+    def embed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+    def embed_query(self, text):
+        vector = np.zeros(len(QUESTIONS), dtype=np.float32)
+        vector[QUESTIONS.index(text)] = 1
+        return vector.tolist()
+
+
+class FakePipeline:
+    def __init__(self, index_name="emgt605_v4", index_version="v-1"):
+        self.vector_search = SimpleNamespace(index_name=index_name, embedding_model=FakeEmbeddings())
+        self.index_version = index_version
+
+    def run(self, query, response_type, content_type_filter):
+        if query == QUESTIONS[2]:
+            raise ValueError("Could not find the old citation id 7 in citation_mapping")
+        return {"content": f"{response_type} to {query} [1]", "citation": {1: {"url": "https://example.com", "title": "Source",
+                                                                            "content_type": "html_content"}}}
+
+def build_store():
+    return FAQStore.build(FakePipeline(), QUESTIONS, ["answer", "recommendation"], [None, "html_content"])
+
+
+def test_build_skips_failing_entries():
+    faq_store = build_store()
+    assert len(faq_store) == 2 * 2 * 2
+    assert faq_store.skipped == 2 * 2
+
+def test_lookup_matches_index_name_and_version():
+    faq_store = build_store()
+    query = FakeEmbeddings().embed_query(QUESTIONS[0])
+    answer = faq_store.lookup(query, "answer", None, index_name="emgt605_v4", index_version="v-1")
+    assert answer["content"] == f"answer to {QUESTIONS[0]} [1]"
+    # Same index name but re-synced with different content
+    assert faq_store.lookup(query, "answer", None, index_name="emgt605_v4", index_version="v-2") is None
+    assert faq_store.lookup(query, "answer", None, index_name="emgt605_v5", index_version="v-1") is None
+    # No stored answer for a failed entry or a dissimilar question
+    assert faq_store.lookup(FakeEmbeddings().embed_query(QUESTIONS[2]), "answer", None, "emgt605_v4", "v-1") is None
+
+def test_save_and_load(tmp_path):
+    build_store().save(str(tmp_path))
+    faq_store = FAQStore.load(str(tmp_path))
+    answer = faq_store.lookup(FakeEmbeddings().embed_query(QUESTIONS[1]), "recommendation", "html_content",
+                            index_name="emgt605_v4", index_version="v-1")
+    assert answer["content"] == f"recommendation to {QUESTIONS[1]} [1]"
+    assert list(answer["citation"]) == [1]
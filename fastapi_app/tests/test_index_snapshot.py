@@ -0,0 +1,85 @@
+import json
+import os
+
+from utils.DocumentCache import DocumentCache, ParsedIndexMetadata
+from utils.IndexSnapshot import FileExportSource, apply_delta, current_snapshot, sync_snapshot
+
+
+def make_doc(pk: str, num_blocks: int):
+    blocks = [{"block_id": f"{pk}-{i}", "char_start": i * 100} for i in range(num_blocks)]
+    return {"pk": pk, "text": f"text of {pk}", "index_metadata": json.dumps(blocks)}
+
+def write_export(path, docs):
+    with open(path, "w", encoding="utf-8") as f:
+        for doc in docs:
+            f.write(json.dumps(doc) + "\n")
+    return FileExportSource(str(path))
+
+def cache_of(docs):
+    document_cache = DocumentCache()
+    for doc in docs:
+        document_cache.put(doc["pk"], ParsedIndexMetadata.from_json(doc["index_metadata"]))
+    return document_cache
+
+
+def test_sync_snapshot_delta(tmp_path):
+    snapshot_dir = str(tmp_path / "snapshots")
+    os.makedirs(snapshot_dir)
+    first = sync_snapshot(write_export(tmp_path / "v1.jsonl", [make_doc("a", 1), make_doc("b", 1), make_doc("c", 1)]),
+                        snapshot_dir, "index_v1")
+    assert first == {"base_generation": None, "changed": ["a", "b", "c"], "removed": []}
+    base = current_snapshot(snapshot_dir)
+
+    second = sync_snapshot(write_export(tmp_path / "v2.jsonl", [make_doc("a", 1), make_doc("b", 2), make_doc("d", 1)]),
+                        snapshot_dir, "index_v2")
+    assert second == {"base_generation": base["generation"], "changed": ["b", "d"], "removed": ["c"]}
+    assert current_snapshot(snapshot_dir)["index_name"] == "index_v2"
+    assert current_snapshot(snapshot_dir)["content_version"] != base["content_version"]
+
+def test_resync_same_index_gets_new_generation_and_prunes_old(tmp_path):
+    snapshot_dir = str(tmp_path / "snapshots")
+    os.makedirs(snapshot_dir)
+    source = write_export(tmp_path / "v1.jsonl", [make_doc("a", 1)])
+    sync_snapshot(source, snapshot_dir, "index_v1")
+    first = current_snapshot(snapshot_dir)
+
+    delta = sync_snapshot(source, snapshot_dir, "index_v1")
+    second = current_snapshot(snapshot_dir)
+    assert second["index_name"] == first["index_name"]
+    assert second["generation"] != first["generation"]
+    assert delta == {"base_generation": first["generation"], "changed": [], "removed": []}
+    # Unchanged content keeps its content version
+    assert second["content_version"] == first["content_version"]
+    # Only the current generation is kept on disk
+    assert sorted(os.listdir(snapshot_dir)) == sorted(["CURRENT", second["generation"]])
+
+def test_apply_delta(tmp_path):
+    snapshot_dir = str(tmp_path / "snapshots")
+    os.makedirs(snapshot_dir)
+    old_docs = [make_doc("a", 1), make_doc("b", 1), make_doc("c", 1)]
+    sync_snapshot(write_export(tmp_path / "v1.jsonl", old_docs), snapshot_dir, "index_v1")
+    base_generation = current_snapshot(snapshot_dir)["generation"]
+    sync_snapshot(write_export(tmp_path / "v2.jsonl", [make_doc("a", 1), make_doc("b", 3)]), snapshot_dir, "index_v2")
+    generation = current_snapshot(snapshot_dir)["generation"]
+
+    old_cache = cache_of(old_docs)
+    new_cache = apply_delta(old_cache, snapshot_dir, generation, base_generation)
+    # Unchanged entries are carried over as is
+    assert new_cache.get("a") is old_cache.get("a")
+    # Changed entries are re-parsed from the new snapshot
+    assert list(new_cache.get("b").char_starts) == [0, 100, 200]
+    # Removed entries are dropped
+    assert "c" not in new_cache
+    # The running cache is left untouched
+    assert list(old_cache.get("b").char_starts) == [0]
+    assert "c" in old_cache
+
+def test_apply_delta_from_other_base_starts_empty(tmp_path):
+    snapshot_dir = str(tmp_path / "snapshots")
+    os.makedirs(snapshot_dir)
+    docs = [make_doc("a", 1)]
+    sync_snapshot(write_export(tmp_path / "v1.jsonl", docs), snapshot_dir, "index_v1")
+    generation = current_snapshot(snapshot_dir)["generation"]
+
+    new_cache = apply_delta(cache_of(docs), snapshot_dir, generation, "index_v0-unknown")
+    assert len(new_cache) == 0
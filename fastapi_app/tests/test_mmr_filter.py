@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+
+from utils.MMRFilter import MMRFilter
+
+
+def unit(*values):
+    vector = np.asarray(values, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+def test_near_duplicates_are_dropped():
+    query = unit(1, 0, 0)
+    # 1 is a near-duplicate of 0, and 2 is less relevant but different
+    candidates = [unit(1, 0.1, 0), unit(1, 0.11, 0), unit(0.5, 0, 1)]
+    selected = MMRFilter(lambda_mult=0.9, duplicate_threshold=0.95).select(query, candidates, k=3)
+    assert selected == [0, 2]
+
+def test_without_duplicate_threshold_all_candidates_can_be_selected():
+    query = unit(1, 0, 0)
+    candidates = [unit(1, 0.1, 0), unit(1, 0.11, 0), unit(0.5, 0, 1)]
+    selected = MMRFilter(lambda_mult=0.9, duplicate_threshold=None).select(query, candidates, k=3)
+    assert sorted(selected) == [0, 1, 2]
+
+def test_k_larger_than_candidates():
+    candidates = [unit(1, 0, 0), unit(0, 1, 0)]
+    assert sorted(MMRFilter().select(unit(1, 1, 0), candidates, k=5)) == [0, 1]
+    assert MMRFilter().select(unit(1, 1, 0), np.empty((0, 3), dtype=np.float32), k=5) == []
+
+def test_supplied_relevance_overrides_cosine_similarity():
+    query = unit(1, 0, 0)
+    candidates = [unit(1, 0, 0), unit(0, 1, 0)]
+    # E.g. the semantic reranker prefers the second candidate
+    selected = MMRFilter(lambda_mult=1.0).select(query, candidates, k=2, relevance=[0.1, 0.9])
+    assert selected == [1, 0]
+
+def test_lambda_one_keeps_relevance_order():
+    rng = np.random.default_rng(0)
+    candidates = rng.normal(size=(10, 16)).astype(np.float32)
+    relevance = rng.random(10)
+    selected = MMRFilter(lambda_mult=1.0, duplicate_threshold=None).select(rng.normal(size=16), candidates, k=4, relevance=relevance)
+    assert selected == list(np.argsort(-relevance)[:4])
+
+def test_invalid_lambda():
+    with pytest.raises(ValueError):
+        MMRFilter(lambda_mult=1.5)
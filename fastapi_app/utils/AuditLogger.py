@@ -0,0 +1,123 @@
+import glob
+import gzip
+import json
+import os
+import queue
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+
+class AuditLogger:
+    """Non-blocking audit log of the QA requests.
+    Records are put on a bounded in-memory queue and a background thread writes them in batches to
+    rotating gzip-compressed JSONL files, keeping at most max_files files in the log directory. When the queue is above the high watermark, only a sample of
+    the records is kept, and records are dropped when the queue is full, so logging never blocks a request.
+    """
+    def __init__(self, log_dir: str, queue_size: int = 10000, batch_size: int = 500, flush_interval: float = 1.0,
+                max_file_bytes: int = 64 * 1024 * 1024, max_files: int = 20, overload_sample_rate: float = 0.1,
+                high_watermark: float = 0.8):
+        self.log_dir = log_dir
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_file_bytes = max_file_bytes
+        self.max_files = max_files
+        self.overload_sample_rate = overload_sample_rate
+        self.high_watermark = int(queue_size * high_watermark)
+        self.dropped = 0
+        self.written = 0
+        self._queue: "queue.Queue[Dict]" = queue.Queue(maxsize=queue_size)
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._file_path: Optional[str] = None
+
+    def start(self) -> None:
+        os.makedirs(self.log_dir, exist_ok=True)
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="audit-logger", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Stop the writer thread after flushing the queued records."""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def log(self, record: Dict) -> bool:
+        """Queue the record without blocking. Return False if the record was dropped."""
+        if self._queue.qsize() >= self.high_watermark:
+            if random.random() >= self.overload_sample_rate:
+                self.dropped += 1
+                return False
+            record["sample_rate"] = self.overload_sample_rate
+        try:
+            self._queue.put_nowait(record)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def _next_batch(self) -> List[Dict]:
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while not self._stop_event.is_set():
+            batch = self._next_batch()
+            if batch:
+                self._write_batch(batch)
+        # Flush whatever is left on shutdown
+        batch = []
+        while True:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        if batch:
+            self._write_batch(batch)
+
+    def _current_file(self) -> str:
+        # The current file may have been pruned by another worker's rotation, so a missing file rotates too
+        if (self._file_path is None or not os.path.exists(self._file_path)
+                or os.path.getsize(self._file_path) >= self.max_file_bytes):
+            timestamp = datetime.now(timezone.utc).strftime("%Y%m%d-%H%M%S-%f")
+            # The pid keeps the files of different uvicorn workers apart
+            self._file_path = os.path.join(self.log_dir, f"audit-{timestamp}-{os.getpid()}.jsonl.gz")
+            self._remove_old_files()
+        return self._file_path
+
+    def _remove_old_files(self) -> None:
+        """Delete the oldest audit files beyond max_files, like backupCount of RotatingFileHandler.
+        Files of all workers (and of previous runs) share the limit, so it should be above the number of workers.
+        A worker whose current file is removed here starts a new file on its next batch.
+        """
+        # The timestamp in the name breaks mtime ties on filesystems with a coarse mtime resolution
+        files = sorted(glob.glob(os.path.join(self.log_dir, "audit-*.jsonl.gz")), key=lambda path: (os.path.getmtime(path), path))
+        # The new file is not created yet, so keep room for it
+        for path in files[:max(0, len(files) - (self.max_files - 1))]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _write_batch(self, batch: List[Dict]) -> None:
+        lines = "".join(json.dumps(record, default=str) + "\n" for record in batch)
+        try:
+            # Each batch is appended as a separate gzip member, which gzip readers concatenate transparently
+            with gzip.open(self._current_file(), "at", encoding="utf-8") as f:
+                f.write(lines)
+            self.written += len(batch)
+        except OSError:
+            self.dropped += len(batch)
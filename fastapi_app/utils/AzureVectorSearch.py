@@ -1,22 +1,45 @@
-import json
 from typing import Optional
 
+import numpy as np
 from azure.core.credentials import AzureKeyCredential
 from azure.search.documents import SearchClient
 from azure.search.documents.models import HybridSearch, VectorizedQuery
 from langchain_openai import OpenAIEmbeddings
 
+from utils.CPUExecutor import CPUExecutor
+from utils.DocumentCache import DocumentCache, ParsedIndexMetadata
+from utils.MMRFilter import MMRFilter
+
 
 class AzureVectorSearch:
-    def __init__(self, search_endpoint: str, search_key: str, index_name: str, embedding_model: OpenAIEmbeddings, output_fields: list[str]):
+    def __init__(self, search_endpoint: str, search_key: str, index_name: str, embedding_model: OpenAIEmbeddings, output_fields: list[str],
+                document_cache: Optional[DocumentCache] = None, mmr_filter: Optional[MMRFilter] = None,
+                cpu_executor: Optional[CPUExecutor] = None):
         self.search_client = SearchClient(endpoint=search_endpoint,
                                         credential=AzureKeyCredential(search_key),
                                         index_name=index_name)
+        self.index_name = index_name
         self.embedding_model = embedding_model
         self.output_fields = output_fields
+        self.document_cache = document_cache if document_cache is not None else DocumentCache()
+        self.mmr_filter = mmr_filter
+        self.cpu_executor = cpu_executor if cpu_executor is not None else CPUExecutor()
+
+    def hybrid_search(self, query: str, top_k_each: int = 5, top_k_final: int = 5, filter: Optional[str] = None,
+                    embedded_query: Optional[list[float]] = None):
+        # Reuse the query embedding if it was already computed (e.g. by the FAQ lookup)
+        if embedded_query is None:
+            embedded_query = self.embedding_model.embed_query(query)
 
-    def hybrid_search(self, query: str, top_k_each: int = 5, top_k_final: int = 5, filter: Optional[str] = None):
-        embedded_query = self.embedding_model.embed_query(query)
+        # Over-fetch candidates with their embeddings so the MMR filter can drop near-duplicates
+        use_mmr = self.mmr_filter is not None and self.mmr_filter.candidate_pool_size > 0
+        if use_mmr:
+            top_k_each = max(top_k_each, self.mmr_filter.candidate_pool_size)
+            top = max(top_k_final, self.mmr_filter.candidate_pool_size)
+            select = self.output_fields + ["dense_vector"]
+        else:
+            top = top_k_final
+            select = self.output_fields
 
         search_results = self.search_client.search(  
             search_text=query,  
@@ -26,16 +49,38 @@ class AzureVectorSearch:
                 vector=embedded_query, 
                 k_nearest_neighbors=top_k_each, 
                 fields="dense_vector")],
-            top=top_k_final,
-            select=self.output_fields,
+            top=top,
+            select=select,
             query_type="semantic",
             semantic_configuration_name="my-semantic-config",
             filter=filter
         )  
         
         results = list(search_results)
+
+        if use_mmr and any(r.get('dense_vector') is None for r in results):
+            # The vector field is not retrievable (or missing on some hits), so fall back to the plain top-k
+            results = results[:top_k_final]
+            for r in results:
+                r.pop('dense_vector', None)
+        elif use_mmr and results:
+            # Use the semantic reranker score (0-4) as the relevance so the reranking is not discarded
+            if all(r.get('@search.reranker_score') is not None for r in results):
+                relevance = [r['@search.reranker_score'] / 4 for r in results]
+            else:
+                relevance = None
+            candidate_vectors = np.asarray([r['dense_vector'] for r in results], dtype=np.float32)
+            # MMR runs inline: it is a few small matrix products, which cost less than a round trip to the process pool
+            selected = self.mmr_filter.select(embedded_query, candidate_vectors, k=top_k_final, relevance=relevance)
+            results = [results[i] for i in selected]
+            for r in results:
+                del r['dense_vector']
         
         for r in results:
-            r['index_metadata'] = json.loads(r['index_metadata'])
+            # index_metadata is decoded once per pk and shared read-only across requests
+            r['index_metadata'] = self.document_cache.get_or_parse(r['pk'], r['index_metadata'], parse=self._parse_index_metadata)
             
-        return results
\ No newline at end of file
+        return results
+    
+    def _parse_index_metadata(self, raw: str) -> ParsedIndexMetadata:
+        return self.cpu_executor.run(ParsedIndexMetadata.from_json, raw, size=len(raw))
\ No newline at end of file
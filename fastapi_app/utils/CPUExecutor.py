@@ -0,0 +1,53 @@
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class CPUExecutor:
+    """Run CPU-bound stages (formatting, JSON decoding) in a process pool, so they do not hold the GIL of
+    the worker serving the requests. Inputs smaller than size_threshold (in characters) run inline since the
+    pickling would cost more than it saves. With max_workers=0 everything runs inline.
+    """
+    def __init__(self, max_workers: int = 0, size_threshold: int = 32 * 1024):
+        self.max_workers = max_workers
+        self.size_threshold = size_threshold
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        if max_workers > 0:
+            self._pool = self._new_pool()
+
+    def _new_pool(self) -> ProcessPoolExecutor:
+        # spawn avoids forking the threads of the app (e.g. the audit logger) into the workers
+        return ProcessPoolExecutor(max_workers=self.max_workers, mp_context=multiprocessing.get_context("spawn"))
+
+    def _replace_broken_pool(self, broken: ProcessPoolExecutor) -> None:
+        with self._lock:
+            # Concurrent requests may all see the same broken pool, so only the first one replaces it
+            if self._pool is broken:
+                broken.shutdown(wait=False)
+                self._pool = self._new_pool()
+
+    def run(self, fn: Callable, *args, size: int, **kwargs):
+        """Call fn(*args, **kwargs), in the process pool if size reaches the threshold.
+        If a pool worker died (e.g. killed when out of memory), the pool is replaced and the call runs inline.
+        """
+        pool = self._pool
+        if pool is None or size < self.size_threshold:
+            return fn(*args, **kwargs)
+        try:
+            return pool.submit(fn, *args, **kwargs).result()
+        except BrokenProcessPool:
+            logger.exception("A CPUExecutor worker died, restarting the process pool")
+            self._replace_broken_pool(pool)
+            return fn(*args, **kwargs)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
@@ -144,7 +144,6 @@ class CitationFormatter:
                                 citation['old_citation_ids'].append(source_split['source_id'])
                                 citation['block_ids'].append(source_split['block_id'])
         
-        print(citation_data)
         new_citation_data = []
         for citation in citation_data:        
             if citation['content_type'] == 'video_transcript':
@@ -153,7 +152,6 @@ class CitationFormatter:
                 citation['final_url'] = citation['url'] + "/block/" + ",".join(citation['block_ids'])
                 new_citation_data.append(citation)
                 
-        print(new_citation_data)
         # process the final citation url and id
         new_citation_id = 1
         for citation in new_citation_data:
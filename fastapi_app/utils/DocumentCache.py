@@ -0,0 +1,114 @@
+import json
+import sys
+import threading
+from array import array
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+
+class ParsedIndexMetadata:
+    """Compact, read-only form of a chunk's index_metadata block list.
+    char_starts holds the block start offsets and block_ids maps each block identifier key
+    (e.g. start_time or data_block_id) to its values, both in the original char_start order.
+    """
+    __slots__ = ("char_starts", "block_ids", "nbytes")
+
+    def __init__(self, char_starts: array, block_ids: Dict[str, Tuple]):
+        self.char_starts = char_starts
+        self.block_ids = block_ids
+        self.nbytes = sys.getsizeof(char_starts) + sys.getsizeof(block_ids)
+        for key, values in block_ids.items():
+            self.nbytes += sys.getsizeof(key) + sys.getsizeof(values) + sum(sys.getsizeof(value) for value in values)
+
+    @classmethod
+    def from_json(cls, raw: str) -> "ParsedIndexMetadata":
+        blocks = json.loads(raw)
+        char_starts = array("q", (block["char_start"] for block in blocks))
+        keys = [key for key in blocks[0] if key != "char_start"] if blocks else []
+        block_ids = {key: tuple(block.get(key) for block in blocks) for key in keys}
+        return cls(char_starts, block_ids)
+
+    def __len__(self) -> int:
+        return len(self.char_starts)
+
+
+class DocumentCache:
+    """LRU cache of ParsedIndexMetadata keyed by the document pk, bounded by an approximate byte budget."""
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[str, ParsedIndexMetadata]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _entry_bytes(pk: str, parsed: ParsedIndexMetadata) -> int:
+        return sys.getsizeof(pk) + sys.getsizeof(parsed) + parsed.nbytes
+
+    def get(self, pk: str) -> Optional[ParsedIndexMetadata]:
+        with self._lock:
+            parsed = self._entries.get(pk)
+            if parsed is not None:
+                self._entries.move_to_end(pk)
+            return parsed
+
+    def put(self, pk: str, parsed: ParsedIndexMetadata) -> None:
+        entry_bytes = self._entry_bytes(pk, parsed)
+        # Entries larger than the whole budget are served uncached
+        if entry_bytes > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(pk, None)
+            if old is not None:
+                self.current_bytes -= self._entry_bytes(pk, old)
+            self._entries[pk] = parsed
+            self.current_bytes += entry_bytes
+            while self.current_bytes > self.max_bytes:
+                old_pk, old = self._entries.popitem(last=False)
+                self.current_bytes -= self._entry_bytes(old_pk, old)
+                self.evictions += 1
+
+    def get_or_parse(self, pk: str, raw: str, parse: Optional[Callable[[str], ParsedIndexMetadata]] = None) -> ParsedIndexMetadata:
+        """Return the cached parsed metadata of the pk, decoding the raw JSON only on a cache miss.
+        parse can replace ParsedIndexMetadata.from_json, e.g. to decode in another process.
+        """
+        # The lookup and the hit/miss counters share the lock, since requests run concurrently in the threadpool
+        with self._lock:
+            parsed = self._entries.get(pk)
+            if parsed is not None:
+                self._entries.move_to_end(pk)
+                self.hits += 1
+                return parsed
+            self.misses += 1
+        parsed = (parse or ParsedIndexMetadata.from_json)(raw)
+        self.put(pk, parsed)
+        return parsed
+
+    def copy(self, exclude: Iterable[str] = ()) -> "DocumentCache":
+        """Return a new cache with the same budget and entries (in LRU order), except the excluded pks."""
+        exclude = set(exclude)
+        new_cache = DocumentCache(max_bytes=self.max_bytes)
+        with self._lock:
+            entries = [(pk, parsed) for pk, parsed in self._entries.items() if pk not in exclude]
+        for pk, parsed in entries:
+            new_cache.put(pk, parsed)
+        return new_cache
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "current_bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def __contains__(self, pk: str) -> bool:
+        return pk in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,108 @@
+import json
+import logging
+import os
+from typing import Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1
+    return vectors / norms
+
+
+class FAQStore:
+    """Precomputed answers of frequent questions, matched against the query embedding by cosine similarity.
+    The store is a directory with a manifest.json of the entries and a vectors.npy matrix of the
+    normalized question embeddings, which is memory-mapped on load.
+    """
+    MANIFEST_FILE = "manifest.json"
+    VECTORS_FILE = "vectors.npy"
+
+    def __init__(self, questions: List[str], vectors: np.ndarray, entries: List[Dict], skipped: int = 0):
+        self.questions = questions
+        self.vectors = vectors
+        self.entries = entries
+        # Number of entries which failed while building the store
+        self.skipped = skipped
+        # Map (response_type, content_type_filter, question_id) to the entry for O(1) lookup after the vector search
+        self._entry_map = {
+            (entry["response_type"], entry["content_type_filter"], entry["question_id"]): entry
+            for entry in entries
+        }
+
+    @classmethod
+    def build(cls, qa_pipeline, questions: List[str], response_types: List[str], content_type_filters: List[Optional[str]]) -> "FAQStore":
+        """Run each question through the QA pipeline for every response type and content filter.
+        Answers without any citation (rejected by the guardrail or without relevant content) are not stored.
+        A failing run (e.g. the LLM cites an unknown source id) is logged and skipped, so it does not abort the build.
+        """
+        index_name = qa_pipeline.vector_search.index_name
+        index_version = qa_pipeline.index_version
+        embeddings = qa_pipeline.vector_search.embedding_model.embed_documents(questions)
+        vectors = _normalize(np.asarray(embeddings, dtype=np.float32))
+
+        entries = []
+        skipped = 0
+        for question_id, question in enumerate(questions):
+            for response_type in response_types:
+                for content_type_filter in content_type_filters:
+                    try:
+                        response = qa_pipeline.run(query=question, response_type=response_type, content_type_filter=content_type_filter)
+                    except Exception:
+                        logger.exception(f"Skipping the FAQ entry of {question!r} ({response_type}, {content_type_filter})")
+                        skipped += 1
+                        continue
+                    if not response["citation"]:
+                        continue
+                    entries.append({
+                        "question_id": question_id,
+                        "response_type": response_type,
+                        "content_type_filter": content_type_filter,
+                        "index_name": index_name,
+                        "index_version": index_version,
+                        "content": response["content"],
+                        "citation": response["citation"],
+                    })
+        return cls(questions, vectors, entries, skipped=skipped)
+
+    def save(self, path: str) -> None:
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, self.VECTORS_FILE), self.vectors.astype(np.float32))
+        with open(os.path.join(path, self.MANIFEST_FILE), "w", encoding="utf-8") as f:
+            json.dump({"questions": self.questions, "entries": self.entries}, f)
+
+    @classmethod
+    def load(cls, path: str) -> "FAQStore":
+        with open(os.path.join(path, cls.MANIFEST_FILE), encoding="utf-8") as f:
+            manifest = json.load(f)
+        vectors = np.load(os.path.join(path, cls.VECTORS_FILE), mmap_mode="r")
+        entries = manifest["entries"]
+        # JSON turns the citation ids into strings
+        for entry in entries:
+            entry["citation"] = {int(k): v for k, v in entry["citation"].items()}
+        return cls(manifest["questions"], vectors, entries)
+
+    def lookup(self, query_embedding: List[float], response_type: str, content_type_filter: Optional[str],
+            index_name: str, index_version: Optional[str], threshold: float = 0.95) -> Optional[Dict]:
+        """Return the stored answer of the closest question if it is similar enough and was built on the same
+        index name and content version."""
+        if not self.entries:
+            return None
+        query_vector = _normalize(np.asarray(query_embedding, dtype=np.float32))
+        scores = self.vectors @ query_vector
+        question_id = int(np.argmax(scores))
+        if scores[question_id] < threshold:
+            return None
+
+        entry = self._entry_map.get((response_type, content_type_filter, question_id))
+        # Reject answers built before the course content was re-indexed, including a re-sync under the same name
+        if entry is None or entry["index_name"] != index_name or entry.get("index_version") != index_version:
+            return None
+        return {"content": entry["content"], "citation": entry["citation"]}
+
+    def __len__(self) -> int:
+        return len(self.entries)
@@ -0,0 +1,152 @@
+import hashlib
+import json
+import os
+import shutil
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional, Set
+
+from azure.core.credentials import AzureKeyCredential
+from azure.search.documents import SearchClient
+
+from utils.DocumentCache import DocumentCache, ParsedIndexMetadata
+
+CURRENT_FILE = "CURRENT"
+DOCUMENTS_FILE = "documents.jsonl"
+HASHES_FILE = "hashes.json"
+DELTA_FILE = "delta.json"
+
+
+class AzureIndexExportSource:
+    """Stream all documents of an Azure Search index page by page, ordered by pk."""
+    def __init__(self, search_endpoint: str, search_key: str, index_name: str, fields: List[str], page_size: int = 1000):
+        self.search_client = SearchClient(endpoint=search_endpoint,
+                                        credential=AzureKeyCredential(search_key),
+                                        index_name=index_name)
+        self.fields = fields
+        self.page_size = page_size
+
+    def iter_documents(self) -> Iterator[Dict]:
+        last_pk = None
+        while True:
+            # Keyset pagination on pk, since skip is capped by Azure Search
+            filter = None if last_pk is None else "pk gt '{}'".format(last_pk.replace("'", "''"))
+            page = list(self.search_client.search(search_text="*", select=self.fields, filter=filter,
+                                                order_by=["pk asc"], top=self.page_size))
+            for doc in page:
+                yield {field: doc.get(field) for field in self.fields}
+            if len(page) < self.page_size:
+                break
+            last_pk = page[-1]["pk"]
+
+
+class FileExportSource:
+    """Stream documents from a local JSONL export (one document per line), e.g. for offline syncs and testing."""
+    def __init__(self, path: str):
+        self.path = path
+
+    def iter_documents(self) -> Iterator[Dict]:
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def content_hash(doc: Dict) -> str:
+    return hashlib.sha256(json.dumps(doc, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+def content_version(hashes: Dict[str, str]) -> str:
+    """Fingerprint of the whole index content from the per-document hashes."""
+    return hashlib.sha256(json.dumps(hashes, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+def _write_json_atomic(path: str, data) -> None:
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+def current_snapshot(snapshot_dir: str) -> Optional[Dict]:
+    """Return the index name, generation and content version of the active snapshot, or None if no snapshot
+    has been synced yet. Every sync gets a new generation, so re-syncing the same index name is detected as a
+    new snapshot too. The content version only changes when the documents do.
+    """
+    try:
+        with open(os.path.join(snapshot_dir, CURRENT_FILE), encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+def load_delta(snapshot_dir: str, generation: str) -> Dict:
+    with open(os.path.join(snapshot_dir, generation, DELTA_FILE), encoding="utf-8") as f:
+        return json.load(f)
+
+def iter_snapshot_documents(snapshot_dir: str, generation: str, pks: Optional[Set[str]] = None) -> Iterator[Dict]:
+    """Stream the documents of a snapshot, optionally only those with the given pks."""
+    with open(os.path.join(snapshot_dir, generation, DOCUMENTS_FILE), encoding="utf-8") as f:
+        for line in f:
+            record = json.loads(line)
+            if pks is None or record["pk"] in pks:
+                yield record["document"]
+
+def _remove_superseded_snapshots(snapshot_dir: str, generation: str) -> None:
+    """Delete the snapshot directories other than the current generation, since each one is a full copy of the index."""
+    for name in os.listdir(snapshot_dir):
+        path = os.path.join(snapshot_dir, name)
+        if name != generation and os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+
+def sync_snapshot(source, snapshot_dir: str, index_name: str) -> Dict:
+    """Stream the export source into a new snapshot generation and mark it as current.
+    The delta against the previous current snapshot (changed and removed pks by content hash) is saved with it.
+    """
+    base = current_snapshot(snapshot_dir)
+    previous_hashes = {}
+    if base is not None:
+        with open(os.path.join(snapshot_dir, base["generation"], HASHES_FILE), encoding="utf-8") as f:
+            previous_hashes = json.load(f)
+
+    # A new directory per sync, so the snapshot that CURRENT points at is never modified
+    generation = f"{index_name}-{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S%f')}"
+    snapshot_path = os.path.join(snapshot_dir, generation)
+    # Write into a temporary directory so a failed sync never leaves a partial snapshot behind
+    tmp_path = snapshot_path + ".tmp"
+    os.makedirs(tmp_path)
+
+    hashes = {}
+    changed = []
+    with open(os.path.join(tmp_path, DOCUMENTS_FILE), "w", encoding="utf-8") as f:
+        for doc in source.iter_documents():
+            pk = doc["pk"]
+            doc_hash = content_hash(doc)
+            hashes[pk] = doc_hash
+            if previous_hashes.get(pk) != doc_hash:
+                changed.append(pk)
+            f.write(json.dumps({"pk": pk, "content_hash": doc_hash, "document": doc}, ensure_ascii=False) + "\n")
+    removed = [pk for pk in previous_hashes if pk not in hashes]
+
+    delta = {"base_generation": base["generation"] if base else None, "changed": changed, "removed": removed}
+    _write_json_atomic(os.path.join(tmp_path, HASHES_FILE), hashes)
+    _write_json_atomic(os.path.join(tmp_path, DELTA_FILE), delta)
+
+    os.replace(tmp_path, snapshot_path)
+    _write_json_atomic(os.path.join(snapshot_dir, CURRENT_FILE),
+                    {"index_name": index_name, "generation": generation, "content_version": content_version(hashes)})
+    _remove_superseded_snapshots(snapshot_dir, generation)
+    return delta
+
+def apply_delta(document_cache: DocumentCache, snapshot_dir: str, generation: str, base_generation: Optional[str]) -> DocumentCache:
+    """Derive the document cache of the new snapshot from the cache of the running snapshot.
+    Unchanged entries are kept, and the changed entries that were cached are re-parsed from the snapshot.
+    The running cache is not modified, so in-flight requests on the old snapshot keep consistent metadata.
+    """
+    delta = load_delta(snapshot_dir, generation)
+    # The delta is only valid against the snapshot it was computed from
+    if base_generation is None or delta["base_generation"] != base_generation:
+        return DocumentCache(max_bytes=document_cache.max_bytes)
+
+    changed = set(delta["changed"])
+    new_cache = document_cache.copy(exclude=changed.union(delta["removed"]))
+    cached_changed = {pk for pk in changed if pk in document_cache}
+    if cached_changed:
+        for doc in iter_snapshot_documents(snapshot_dir, generation, pks=cached_changed):
+            new_cache.put(doc["pk"], ParsedIndexMetadata.from_json(doc["index_metadata"]))
+    return new_cache
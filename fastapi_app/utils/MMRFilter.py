@@ -0,0 +1,55 @@
+from typing import List, Optional
+
+import numpy as np
+
+
+class MMRFilter:
+    """Select a diverse subset of the search candidates with maximal marginal relevance (MMR).
+    lambda_mult trades relevance (1.0) against diversity (0.0), and candidates whose cosine similarity
+    to an already selected candidate reaches duplicate_threshold are dropped as near-duplicates.
+    """
+    def __init__(self, lambda_mult: float = 0.7, candidate_pool_size: int = 15, duplicate_threshold: Optional[float] = 0.95):
+        if not 0 <= lambda_mult <= 1:
+            raise ValueError("lambda_mult must be between 0 and 1")
+        self.lambda_mult = lambda_mult
+        self.candidate_pool_size = candidate_pool_size
+        self.duplicate_threshold = duplicate_threshold
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        norms[norms == 0] = 1
+        return vectors / norms
+
+    def select(self, query_vector: List[float], candidate_vectors: List[List[float]], k: int,
+            relevance: Optional[List[float]] = None) -> List[int]:
+        """Return the indices of up to k selected candidates in the order of selection.
+        relevance defaults to the cosine similarity between the query and each candidate.
+        """
+        candidates = self._normalize(np.asarray(candidate_vectors, dtype=np.float32))
+        num_candidates = len(candidates)
+        if num_candidates == 0:
+            return []
+        if relevance is None:
+            relevance = candidates @ self._normalize(np.asarray(query_vector, dtype=np.float32))
+        else:
+            relevance = np.asarray(relevance, dtype=np.float32)
+
+        weighted_relevance = self.lambda_mult * relevance
+        # Highest similarity of each candidate to any selected candidate so far
+        max_similarity = np.zeros(num_candidates, dtype=np.float32)
+        available = np.ones(num_candidates, dtype=bool)
+        selected = []
+        for _ in range(min(k, num_candidates)):
+            scores = weighted_relevance - (1 - self.lambda_mult) * max_similarity
+            scores[~available] = -np.inf
+            best = int(np.argmax(scores))
+            if not available[best]:
+                break
+            selected.append(best)
+            available[best] = False
+            similarity = candidates @ candidates[best]
+            np.maximum(max_similarity, similarity, out=max_similarity)
+            if self.duplicate_threshold is not None:
+                available &= similarity < self.duplicate_threshold
+        return selected
@@ -1,22 +1,40 @@
+import time
+from datetime import datetime, timezone
 from typing import Optional
-from typing_extensions import Dict, List, TypedDict
+from typing_extensions import Annotated, Dict, List, TypedDict
 
 from langchain_core.prompts import ChatPromptTemplate
 from langgraph.graph import END, START, StateGraph
 
+from utils.AuditLogger import AuditLogger
 from utils.AzureVectorSearch import AzureVectorSearch
 from utils.CitationFormatter import CitationFormatter
+from utils.CPUExecutor import CPUExecutor
+from utils.FAQStore import FAQStore
 from utils.SourceFormatter import SourceFormatter
 
 
+def merge_dicts(left: Dict, right: Dict) -> Dict:
+    """Reducer for the state keys which are collected across nodes (e.g. per-stage timings)."""
+    return {**(left or {}), **(right or {})}
+
+def token_usage_from_response(response) -> Dict:
+    usage_metadata = response.usage_metadata or {}
+    return {key: usage_metadata.get(key) for key in ("input_tokens", "output_tokens", "total_tokens")}
+
 class State(TypedDict):
     response_type: str
+    content_type_filter: Optional[str]
+    query_embedding: List[float]
+    faq_hit: bool
     input_allowed: bool
     question: str
     sources: List[Dict]
     formatted_sources: Dict
     answer: str
     formatted_answer: Dict
+    timings: Annotated[Dict[str, float], merge_dicts]
+    token_usage: Annotated[Dict[str, Dict], merge_dicts]
 
 class PromptManager:
     @staticmethod
@@ -86,45 +104,70 @@ Here is the student question:
     
 class QAPipeline():
     def __init__(self, llm, vector_search: AzureVectorSearch, 
-                course_name: str, search_top_k_each: int = 5, search_top_k_final: int = 5):
+                course_name: str, search_top_k_each: int = 5, search_top_k_final: int = 5,
+                faq_store: Optional[FAQStore] = None, faq_match_threshold: float = 0.95,
+                audit_logger: Optional[AuditLogger] = None, cpu_executor: Optional[CPUExecutor] = None,
+                index_version: Optional[str] = None):
         self.llm = llm
         self.vector_search = vector_search
         self.course_name = course_name
         self.search_top_k_each = search_top_k_each
         self.search_top_k_final = search_top_k_final
+        self.faq_store = faq_store
+        self.faq_match_threshold = faq_match_threshold
+        self.audit_logger = audit_logger
+        self.cpu_executor = cpu_executor if cpu_executor is not None else CPUExecutor()
+        # Content version of the index snapshot, so FAQ answers built on other content are not served
+        self.index_version = index_version
         self.prompt_manager = PromptManager()
         self.source_formatter = SourceFormatter()
         self.citation_formatter = CitationFormatter()
         self.guardrail_prompt = self.prompt_manager.load_guardrail_prompt(course_name)
         self.graph = self.build_graph()
     
+    def faq_lookup(self, state: State):
+        if self.faq_store is None:
+            return {"faq_hit": False}
+        query_embedding = self.vector_search.embedding_model.embed_query(state["question"])
+        faq_answer = self.faq_store.lookup(query_embedding, state["response_type"], state["content_type_filter"],
+                                        index_name=self.vector_search.index_name, index_version=self.index_version,
+                                        threshold=self.faq_match_threshold)
+        if faq_answer is None:
+            return {"faq_hit": False, "query_embedding": query_embedding}
+        return {"faq_hit": True, "query_embedding": query_embedding, "formatted_answer": faq_answer}
+    
+    def faq_routing(self, state: State):
+        return state["faq_hit"]
+    
     def guardrail(self, state: State):
         messages = self.guardrail_prompt.invoke({"question": state["question"]})
         response = self.llm.invoke(messages, max_completion_tokens=1)
-        return {"input_allowed": response.content == "Y"}
+        return {"input_allowed": response.content == "Y", "token_usage": {"guardrail": token_usage_from_response(response)}}
     
     def guardrail_routing(self, state: State):
         return state["input_allowed"]
         
     def retrieve(self, state: State):
-        if self.content_type_filter:
-            filter = f"metadata/content_type eq '{self.content_type_filter}'"
+        if state["content_type_filter"]:
+            filter = f"metadata/content_type eq '{state['content_type_filter']}'"
         else:
             filter = None
-        retrieved_sources = self.vector_search.hybrid_search(query=state["question"], top_k_each=self.search_top_k_each, top_k_final=self.search_top_k_final, filter=filter)
-        formatted_sources = self.source_formatter.format_sources_for_llm(retrieved_sources)
+        retrieved_sources = self.vector_search.hybrid_search(query=state["question"], top_k_each=self.search_top_k_each, top_k_final=self.search_top_k_final, filter=filter,
+                                                            embedded_query=state.get("query_embedding"))
+        formatted_sources = self.cpu_executor.run(self.source_formatter.format_sources_for_llm, retrieved_sources,
+                                                size=sum(len(source['text']) for source in retrieved_sources))
         return {"sources": retrieved_sources, "formatted_sources": formatted_sources}
 
     def generate(self, state: State):
-        if self.response_type == "answer":
-            self.generate_prompt = self.prompt_manager.load_generate_answer_prompt(self.course_name)
-        elif self.response_type == "recommendation":
-            self.generate_prompt = self.prompt_manager.load_generate_recommendation_prompt(self.course_name)
+        if state["response_type"] == "answer":
+            generate_prompt = self.prompt_manager.load_generate_answer_prompt(self.course_name)
+        elif state["response_type"] == "recommendation":
+            generate_prompt = self.prompt_manager.load_generate_recommendation_prompt(self.course_name)
         else:
             raise ValueError("response_type must be either 'answer' or 'recommendation'")
-        messages = self.generate_prompt.invoke({"question": state["question"], "sources": state["formatted_sources"]["content"]})
+        messages = generate_prompt.invoke({"question": state["question"], "sources": state["formatted_sources"]["content"]})
         response = self.llm.invoke(messages)
-        return {"answer": response.content}
+        return {"answer": response.content, "token_usage": {"generate": token_usage_from_response(response)}}
     
     def format_answer(self, state: State):
         if state["input_allowed"] == False:
@@ -132,16 +175,32 @@ class QAPipeline():
             citation = {}
             return {"formatted_answer": {"content": content, "citation": citation}}
         else:
-            formatted_answer = self.citation_formatter.format_final_answer(state["answer"], state["formatted_sources"]['source_dicts'])
+            formatted_answer = self.cpu_executor.run(self.citation_formatter.format_final_answer, state["answer"], state["formatted_sources"]['source_dicts'],
+                                                    size=len(state["answer"]) + len(state["formatted_sources"]['content']))
             return {"formatted_answer": formatted_answer}
     
+    @staticmethod
+    def _timed(stage: str, node):
+        """Wrap the node so its wall time is recorded in the timings of the state."""
+        def timed_node(state: State):
+            start = time.perf_counter()
+            update = node(state)
+            return {**update, "timings": {stage: time.perf_counter() - start}}
+        return timed_node
+    
     def build_graph(self):
         graph_builder = StateGraph(State)
-        graph_builder.add_node("guardrail", self.guardrail)
-        graph_builder.add_node("retrieve", self.retrieve)
-        graph_builder.add_node("generate", self.generate)
-        graph_builder.add_node("format_answer", self.format_answer)
-        graph_builder.add_edge(START, "guardrail")
+        graph_builder.add_node("faq_lookup", self._timed("faq_lookup", self.faq_lookup))
+        graph_builder.add_node("guardrail", self._timed("guardrail", self.guardrail))
+        graph_builder.add_node("retrieve", self._timed("retrieve", self.retrieve))
+        graph_builder.add_node("generate", self._timed("generate", self.generate))
+        graph_builder.add_node("format_answer", self._timed("format_answer", self.format_answer))
+        graph_builder.add_edge(START, "faq_lookup")
+        graph_builder.add_conditional_edges(
+            "faq_lookup",
+            self.faq_routing,
+            {True: END, False: "guardrail"}
+        )
         graph_builder.add_conditional_edges(
             "guardrail", 
             self.guardrail_routing,  
@@ -153,7 +212,35 @@ class QAPipeline():
         return graph_builder.compile()
     
     def run(self, query: str, response_type: str = "recommendation", content_type_filter: Optional[str] = None) -> str or Dict:
-        self.response_type = response_type
-        self.content_type_filter = content_type_filter
-        result = self.graph.invoke({"question": query})
-        return result['formatted_answer']
\ No newline at end of file
+        # The request settings live in the state rather than on self, since requests can run concurrently
+        start = time.perf_counter()
+        result = {"question": query, "response_type": response_type, "content_type_filter": content_type_filter}
+        error = None
+        try:
+            # Stream the state after each node, so a failing request is still logged with the stages it completed
+            for result in self.graph.stream(result, stream_mode="values"):
+                pass
+            return result['formatted_answer']
+        except Exception as e:
+            error = repr(e)
+            raise
+        finally:
+            if self.audit_logger is not None:
+                self.audit_logger.log(self._build_audit_record(result, time.perf_counter() - start, error))
+    
+    def _build_audit_record(self, result: State, total_time: float, error: Optional[str] = None) -> Dict:
+        # JSON encoding is left to the audit logger thread to keep the request path cheap
+        return {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "question": result["question"],
+            "response_type": result["response_type"],
+            "content_type_filter": result["content_type_filter"],
+            "index_name": self.vector_search.index_name,
+            "faq_hit": result.get("faq_hit", False),
+            "input_allowed": result.get("input_allowed"),
+            "retrieved_pks": [source["pk"] for source in result.get("sources", [])],
+            "timings": {**result.get("timings", {}), "total": total_time},
+            "token_usage": result.get("token_usage", {}),
+            "citation": result.get("formatted_answer", {}).get("citation"),
+            "error": error,
+        }
\ No newline at end of file
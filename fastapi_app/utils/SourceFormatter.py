@@ -75,16 +75,17 @@ class SourceFormatter:
         start_index = source['metadata']['start_index']
         end_index = start_index + len(source['text'])
 
-        # Determine the block identifier key
-        block_id_key = config["block_id_key"]
-
-        sorted_blocks = source['index_metadata']
-        for i, block in enumerate(sorted_blocks):
-            block_id = block[block_id_key]
-            block_start = block['char_start']
+        # index_metadata is a ParsedIndexMetadata, so the block starts and ids are read from flat sequences
+        index_metadata = source['index_metadata']
+        char_starts = index_metadata.char_starts
+        block_ids = index_metadata.block_ids.get(config["block_id_key"], ())
+        num_blocks = len(char_starts)
+        for i in range(num_blocks):
+            block_id = block_ids[i]
+            block_start = char_starts[i]
             # Determine the effective end of the block from the next block's start
             next_block_start = (
-                sorted_blocks[i + 1]['char_start'] if i + 1 < len(sorted_blocks) else len(source['text'])
+                char_starts[i + 1] if i + 1 < num_blocks else len(source['text'])
             )
             block_end = next_block_start
 
@@ -9,3 +9,26 @@ OUTPUT_FIELDS = [
 COURSE_NAME = "Sustainability Systems in Engineering"
 LLM_TEMPERATURE = 0
 LLM_MAX_RETRIES = 3
+DOCUMENT_CACHE_MAX_BYTES = 64 * 1024 * 1024
+FAQ_STORE_PATH = "faq_store"
+FAQ_MATCH_THRESHOLD = 0.95
+MMR_ENABLED = True
+MMR_LAMBDA = 0.7
+# Every candidate is fetched with its 3072-d dense_vector: 15 candidates add ~640 KB to each search response
+# and ~10 ms CPU to decode it in the serving process (benchmarks/bench_mmr.py)
+MMR_CANDIDATE_POOL_SIZE = 15
+MMR_DUPLICATE_THRESHOLD = 0.95
+AUDIT_LOG_DIR = "audit_logs"
+AUDIT_LOG_QUEUE_SIZE = 10000
+AUDIT_LOG_BATCH_SIZE = 500
+AUDIT_LOG_FLUSH_INTERVAL = 1.0
+AUDIT_LOG_MAX_FILE_BYTES = 64 * 1024 * 1024
+AUDIT_LOG_MAX_FILES = 20
+AUDIT_LOG_OVERLOAD_SAMPLE_RATE = 0.1
+SNAPSHOT_DIR = "snapshots"
+SNAPSHOT_POLL_INTERVAL = 30
+EXPORT_PAGE_SIZE = 1000
+# None sizes the process pool from the CPU count and the uvicorn workers (WEB_CONCURRENCY)
+CPU_EXECUTOR_WORKERS = None
+# Characters; above ~32K the pooled call costs the serving process less CPU than running inline (benchmarks/bench_cpu_executor.py)
+CPU_EXECUTOR_SIZE_THRESHOLD = 32 * 1024
@@ -1,11 +1,16 @@
 import os
-from typing import Dict
+from typing import Dict, Optional
 
 from dotenv import load_dotenv
 from langchain_openai import ChatOpenAI, OpenAIEmbeddings
 
 from utils import config
+from utils.AuditLogger import AuditLogger
 from utils.AzureVectorSearch import AzureVectorSearch
+from utils.CPUExecutor import CPUExecutor
+from utils.DocumentCache import DocumentCache
+from utils.FAQStore import FAQStore
+from utils.MMRFilter import MMRFilter
 from utils.QAPipeline import QAPipeline
 
 
@@ -28,15 +33,42 @@ def load_config() -> Dict:
         "COURSE_NAME": config.COURSE_NAME,
         "LLM_TEMPERATURE": config.LLM_TEMPERATURE,
         "LLM_MAX_RETRIES": config.LLM_MAX_RETRIES,
-        "OUTPUT_FIELDS": config.OUTPUT_FIELDS
+        "OUTPUT_FIELDS": config.OUTPUT_FIELDS,
+        "DOCUMENT_CACHE_MAX_BYTES": config.DOCUMENT_CACHE_MAX_BYTES,
+        "FAQ_STORE_PATH": config.FAQ_STORE_PATH,
+        "FAQ_MATCH_THRESHOLD": config.FAQ_MATCH_THRESHOLD,
+        "MMR_ENABLED": config.MMR_ENABLED,
+        "MMR_LAMBDA": config.MMR_LAMBDA,
+        "MMR_CANDIDATE_POOL_SIZE": config.MMR_CANDIDATE_POOL_SIZE,
+        "MMR_DUPLICATE_THRESHOLD": config.MMR_DUPLICATE_THRESHOLD,
+        "AUDIT_LOG_DIR": config.AUDIT_LOG_DIR,
+        "AUDIT_LOG_QUEUE_SIZE": config.AUDIT_LOG_QUEUE_SIZE,
+        "AUDIT_LOG_BATCH_SIZE": config.AUDIT_LOG_BATCH_SIZE,
+        "AUDIT_LOG_FLUSH_INTERVAL": config.AUDIT_LOG_FLUSH_INTERVAL,
+        "AUDIT_LOG_MAX_FILE_BYTES": config.AUDIT_LOG_MAX_FILE_BYTES,
+        "AUDIT_LOG_MAX_FILES": config.AUDIT_LOG_MAX_FILES,
+        "AUDIT_LOG_OVERLOAD_SAMPLE_RATE": config.AUDIT_LOG_OVERLOAD_SAMPLE_RATE,
+        "SNAPSHOT_DIR": config.SNAPSHOT_DIR,
+        "SNAPSHOT_POLL_INTERVAL": config.SNAPSHOT_POLL_INTERVAL,
+        "EXPORT_PAGE_SIZE": config.EXPORT_PAGE_SIZE,
+        "CPU_EXECUTOR_WORKERS": config.CPU_EXECUTOR_WORKERS,
+        "CPU_EXECUTOR_SIZE_THRESHOLD": config.CPU_EXECUTOR_SIZE_THRESHOLD
     }
     return session_config
 
-def initialize_vector_search(session_env: Dict, session_config: Dict) -> AzureVectorSearch:
+def initialize_vector_search(session_env: Dict, session_config: Dict, document_cache: Optional[DocumentCache] = None,
+                            cpu_executor: Optional[CPUExecutor] = None) -> AzureVectorSearch:
     embedding_model = OpenAIEmbeddings(openai_api_key=session_env["OPENAI_API_KEY"], model="text-embedding-3-large")
+    if document_cache is None:
+        document_cache = DocumentCache(max_bytes=session_config['DOCUMENT_CACHE_MAX_BYTES'])
+    mmr_filter = None
+    if session_config['MMR_ENABLED']:
+        mmr_filter = MMRFilter(lambda_mult=session_config['MMR_LAMBDA'], candidate_pool_size=session_config['MMR_CANDIDATE_POOL_SIZE'],
+                            duplicate_threshold=session_config['MMR_DUPLICATE_THRESHOLD'])
         
     return AzureVectorSearch(session_env["AZURE_SEARCH_ENDPOINT"], session_env["AZURE_SEARCH_KEY"], session_config['AZURE_INDEX_NAME'], 
-                            embedding_model, session_config['OUTPUT_FIELDS'])
+                            embedding_model, session_config['OUTPUT_FIELDS'], document_cache=document_cache, mmr_filter=mmr_filter,
+                            cpu_executor=cpu_executor)
 
 def initialize_llm(session_env: Dict, session_config: Dict) -> ChatOpenAI:
     return ChatOpenAI(
@@ -45,3 +77,28 @@ def initialize_llm(session_env: Dict, session_config: Dict) -> ChatOpenAI:
         temperature=session_config['LLM_TEMPERATURE'],
         max_retries=session_config['LLM_MAX_RETRIES'])
     
+
+def initialize_faq_store(session_config: Dict) -> Optional[FAQStore]:
+    """Load the precomputed FAQ store if it has been built with build_faq_store.py."""
+    if not os.path.isdir(session_config['FAQ_STORE_PATH']):
+        return None
+    return FAQStore.load(session_config['FAQ_STORE_PATH'])
+
+def initialize_audit_logger(session_config: Dict) -> AuditLogger:
+    return AuditLogger(
+        session_config['AUDIT_LOG_DIR'],
+        queue_size=session_config['AUDIT_LOG_QUEUE_SIZE'],
+        batch_size=session_config['AUDIT_LOG_BATCH_SIZE'],
+        flush_interval=session_config['AUDIT_LOG_FLUSH_INTERVAL'],
+        max_file_bytes=session_config['AUDIT_LOG_MAX_FILE_BYTES'],
+        max_files=session_config['AUDIT_LOG_MAX_FILES'],
+        overload_sample_rate=session_config['AUDIT_LOG_OVERLOAD_SAMPLE_RATE'])
+
+def initialize_cpu_executor(session_config: Dict) -> CPUExecutor:
+    """Size the process pool jointly with the uvicorn workers (WEB_CONCURRENCY), so that the pools of all
+    workers share the cores left over by the workers themselves."""
+    max_workers = session_config['CPU_EXECUTOR_WORKERS']
+    if max_workers is None:
+        uvicorn_workers = int(os.getenv("WEB_CONCURRENCY", 1))
+        max_workers = max(0, (os.cpu_count() or 1) - uvicorn_workers) // uvicorn_workers
+    return CPUExecutor(max_workers=max_workers, size_threshold=session_config['CPU_EXECUTOR_SIZE_THRESHOLD'])